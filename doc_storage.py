@@ -1,10 +1,14 @@
+import atexit
 import sqlite3
+import threading
 import uuid
+import weakref
 from file_parser import *
 from pathlib import Path
 import json
 import logging
-from typing import List, Dict, Optional, Any
+from itertools import chain, islice
+from typing import List, Dict, Optional, Any, Iterable, Iterator, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -14,11 +18,12 @@ CREATE_DOC_TABLE = """
                             id INTEGER PRIMARY KEY AUTOINCREMENT,
                             document_uuid TEXT UNIQUE NOT NULL,
                             filename TEXT NOT NULL,
+                            content_hash TEXT,
                             processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP )
                        """
 CREATE_ELEM_TABLE  = """
             CREATE TABLE IF NOT EXISTS elements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                id INTEGER PRIMARY KEY,
                 document_id INTEGER NOT NULL,
                 element_type TEXT NOT NULL,
                 content TEXT NOT NULL,
@@ -31,6 +36,34 @@ CREATE_ELEM_TABLE  = """
                 FOREIGN KEY (document_id) REFERENCES documents (id) ON DELETE CASCADE
             )
         """
+# Entries end with the rowid, so this index also yields (page_number, id) order per document
+CREATE_ELEM_PAGE_ORDER_INDEX = """
+            CREATE INDEX IF NOT EXISTS idx_elements_page_order
+                ON elements (document_id, page_number)
+        """
+# External-content FTS5 index over elements.content, kept in sync by triggers
+CREATE_ELEM_FTS_TABLE = """
+            CREATE VIRTUAL TABLE IF NOT EXISTS elements_fts
+                USING fts5(content, content='elements', content_rowid='id')
+        """
+CREATE_ELEM_FTS_TRIGGERS = (
+    """
+            CREATE TRIGGER IF NOT EXISTS elements_ai AFTER INSERT ON elements BEGIN
+                INSERT INTO elements_fts (rowid, content) VALUES (new.id, new.content);
+            END
+    """,
+    """
+            CREATE TRIGGER IF NOT EXISTS elements_ad AFTER DELETE ON elements BEGIN
+                INSERT INTO elements_fts (elements_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END
+    """,
+    """
+            CREATE TRIGGER IF NOT EXISTS elements_au AFTER UPDATE OF content ON elements BEGIN
+                INSERT INTO elements_fts (elements_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                INSERT INTO elements_fts (rowid, content) VALUES (new.id, new.content);
+            END
+    """,
+)
 CREATE_STATISTICS_TABLE = """
                 CREATE TABLE IF NOT EXISTS document_statistics (
                             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -48,6 +81,160 @@ CREATE_STATISTICS_TABLE = """
                         )
                        """
 
+# DML statements are kept as module constants so every call passes the same SQL
+# text and hits the connection's prepared-statement cache
+INSERT_DOC = """
+               INSERT INTO documents (document_uuid, filename, content_hash)
+               VALUES (?, ?, ?)
+               """
+INSERT_ELEM_PREFIX = """
+               INSERT INTO elements (document_id, element_type, content, page_number,
+                                     position_x0, position_y0, position_x1, position_y1)
+               VALUES """
+ELEM_ROW_PLACEHOLDER = "(?, ?, ?, ?, ?, ?, ?, ?)"
+ELEM_COLUMN_COUNT = 8
+INSERT_ELEM = INSERT_ELEM_PREFIX + ELEM_ROW_PLACEHOLDER
+INSERT_STATISTICS = """
+               INSERT INTO document_statistics (document_id, title_count,
+                                                section_count, table_count,
+                                                image_count,
+                                                avg_text_density_per_page,
+                                                avg_hierarchical_depth, avg_paragraph_length,
+                                                section_distribution)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+               """
+SELECT_DOC_BY_UUID = """
+               SELECT *
+               FROM documents
+               WHERE document_uuid = ?
+               """
+SELECT_DOC_BY_HASH = """
+               SELECT *
+               FROM documents
+               WHERE content_hash = ?
+               """
+SELECT_DOC_ELEMS = """
+               SELECT e.*
+               FROM elements e
+                        JOIN documents d ON e.document_id = d.id
+               WHERE d.document_uuid = ?
+               """
+SELECT_DOC_STATISTICS = """
+               SELECT title_count, section_count, table_count, image_count,
+                      avg_text_density_per_page,
+                      avg_hierarchical_depth, avg_paragraph_length, section_distribution
+               FROM document_statistics ds
+                        JOIN documents d ON ds.document_id = d.id
+               WHERE d.document_uuid = ?
+               """
+COUNT_DOC_ELEMS = """
+               SELECT COUNT(*) AS element_count
+               FROM elements e
+                        JOIN documents d ON e.document_id = d.id
+               WHERE d.document_uuid = ?
+               """
+# Elements are returned in (page_number, id) order, which is also the keyset used to
+# page through them: rows after the element `after_id` are selected with a row-value
+# comparison. The total subquery is not correlated, so it is evaluated only once
+SELECT_ELEMS_WITH_DOC = """
+               SELECT d.document_uuid AS doc_uuid,
+                      d.filename AS doc_filename,
+                      d.processed_at AS doc_processed_at,
+                      {total_column} AS doc_total,
+                      e.*
+               FROM documents d
+                        LEFT JOIN elements e ON e.document_id = d.id{filters}{cursor}
+               WHERE d.document_uuid = ?
+               ORDER BY e.page_number, e.id
+               LIMIT ?
+               """
+ELEMS_TOTAL_SUBQUERY = """(SELECT COUNT(*)
+                       FROM elements e
+                       WHERE e.document_id = (SELECT id FROM documents WHERE document_uuid = ?){filters})"""
+ELEMS_KEYSET_CURSOR = """
+                            AND (e.page_number, e.id) > (SELECT page_number, id FROM elements WHERE id = ?)"""
+SELECT_STATISTICS_WITH_DOC = """
+               SELECT d.*,
+                      ds.title_count, ds.section_count, ds.table_count, ds.image_count,
+                      ds.avg_text_density_per_page,
+                      ds.avg_hierarchical_depth, ds.avg_paragraph_length, ds.section_distribution
+               FROM documents d
+                        LEFT JOIN document_statistics ds ON ds.document_id = d.id
+               WHERE d.document_uuid = ?
+               """
+STATISTICS_COLUMNS = ("title_count", "section_count", "table_count", "image_count",
+                      "avg_text_density_per_page",
+                      "avg_hierarchical_depth", "avg_paragraph_length", "section_distribution")
+SELECT_GLOBAL_STATISTICS = """
+               SELECT COUNT(*) AS document_count,
+                      COALESCE(AVG(title_count), 0) AS avg_title_count,
+                      COALESCE(AVG(section_count), 0) AS avg_section_count,
+                      COALESCE(AVG(table_count), 0) AS avg_table_count,
+                      COALESCE(AVG(image_count), 0) AS avg_image_count,
+                      COALESCE(AVG(avg_paragraph_length), 0) AS avg_paragraph_length,
+                      COALESCE(AVG(avg_text_density_per_page), 0) AS avg_text_density_per_page
+               FROM document_statistics
+               """
+SELECT_CORPUS_VERSION = """
+               SELECT COALESCE(MAX(id), 0) AS version
+               FROM documents
+               """
+LIST_DOCS = """
+               SELECT document_uuid,
+                      filename,
+                      processed_at
+               FROM documents
+               ORDER BY processed_at DESC LIMIT ?
+               """
+SELECT_ELEM_TYPE_SUMMARY = """
+               SELECT element_type, COUNT(*) as count
+               FROM elements
+               GROUP BY element_type
+               ORDER BY count DESC
+               """
+SEARCH_ELEMS = """
+               SELECT e.*, d.filename, d.document_uuid
+               FROM elements_fts f
+                        JOIN elements e ON e.id = f.rowid
+                        JOIN documents d ON e.document_id = d.id
+               WHERE elements_fts MATCH ?
+               """
+
+# Enough cache slots for every distinct statement, including the filter variants
+# built by get_document_elements and search_content
+STATEMENT_CACHE_SIZE = 256
+
+# Rows per multi-VALUES element insert, further capped by the SQLite bound-parameter limit
+ELEM_INSERT_BATCH_SIZE = 500
+
+# Rows fetched per round-trip when streaming query results
+STREAM_BATCH_SIZE = 256
+
+# Page cache per connection, in KiB. Readers are opened for every threadpool thread,
+# so each gets a small cache and the large one is kept for the single writer
+WRITER_CACHE_SIZE_KIB = 64000
+READER_CACHE_SIZE_KIB = 2000
+
+# Levels accepted for PRAGMA synchronous; SQLite silently ignores anything else
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# Refresh planner statistics after every this many saved documents
+ANALYZE_EVERY_N_DOCUMENTS = 50
+
+
+def _to_fts_query(search_term: str) -> str:
+    """Turn free text into an FTS5 query: every word quoted and matched as a prefix."""
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in search_term.split())
+
+
+class _ReaderHolder:
+    """Thread-local owner of a read connection; its finalizer closes the connection."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
 
 class DocumentStorage:
     """
@@ -55,124 +242,260 @@ class DocumentStorage:
     Designed for easy querying and analysis of document structures.
     """
 
-    def __init__(self, db_path: str = "pdf_documents.sqlite"):
-        """Initialize database connection and create tables if they don't exist."""
+    def __init__(self, db_path: str = "pdf_documents.sqlite", synchronous: str = "NORMAL"):
+        """
+        Initialize database connection and create tables if they don't exist.
+        Use synchronous="FULL" when durability on power loss matters more than write speed.
+        """
+        if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+            raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_LEVELS)}, got {synchronous!r}")
+
         self.db_path = db_path
+        self.synchronous = synchronous.upper()
+        # A single writer connection guarded by a lock, plus one read-only connection
+        # per thread; in WAL mode readers never wait on the writer. A reader is closed
+        # when its thread exits, so short-lived pool threads don't leave connections open
+        self._write_conn = self._connect()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[weakref.finalize] = []
+        self._readers_lock = threading.Lock()
+
+        # Multi-row insert statement for elements, sized to the build's parameter limit
+        max_rows = self._write_conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER) // ELEM_COLUMN_COUNT
+        self._elem_batch_size = min(ELEM_INSERT_BATCH_SIZE, max_rows)
+        self._insert_elem_batch = INSERT_ELEM_PREFIX + ", ".join([ELEM_ROW_PLACEHOLDER] * self._elem_batch_size)
+
         self._create_tables()
+        atexit.register(self.close)
+
+    def _connect(self, read_only: bool = False,
+                 cache_size: int = WRITER_CACHE_SIZE_KIB) -> sqlite3.Connection:
+        """Open a database connection with performance PRAGMAs and a `cache_size` KiB page cache."""
+        # isolation_level=None disables implicit transactions; writes open their own
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                               cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        # WAL + NORMAL avoids an fsync per commit and lets readers run alongside the writer
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA cache_size=-{cache_size}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        # Cap the rows sampled per index by ANALYZE and PRAGMA optimize
+        conn.execute("PRAGMA analysis_limit=400")
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Return the calling thread's read-only connection, opening it on first use."""
+        holder = getattr(self._local, "reader", None)
+        if holder is None:
+            holder = self._local.reader = _ReaderHolder(self._connect(read_only=True, cache_size=READER_CACHE_SIZE_KIB))
+            # The thread-local holder is dropped when the thread exits, which closes the connection
+            closer = weakref.finalize(holder, holder.conn.close)
+            with self._readers_lock:
+                self._readers = [f for f in self._readers if f.alive]
+                self._readers.append(closer)
+        return holder.conn
+
+    def close(self):
+        """Let SQLite refresh planner statistics, then close all connections."""
+        with self._write_lock:
+            if self._write_conn is None:
+                return
+            self._write_conn.execute("PRAGMA optimize")
+            self._write_conn.close()
+            self._write_conn = None
+        with self._readers_lock:
+            for closer in self._readers:
+                closer()
+            self._readers.clear()
 
     def _create_tables(self):
         """Create database tables for storing document data."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-
-            # Documents table - stores metadata about each processed document
-            cursor.execute(CREATE_DOC_TABLE)
-
-            # Elements table - stores individual document elements
-            cursor.execute(CREATE_ELEM_TABLE)
-
-            # Statistics table - stores document-level statistics
-            cursor.execute(CREATE_STATISTICS_TABLE)
-
+        with self._write_lock:
+            cursor = self._write_conn.cursor()
 
-            # Create indexes for better query performance
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_document_id ON elements(document_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_type ON elements(element_type)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_page ON elements(page_number)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_uuid ON documents(document_uuid)")
+            try:
+                # One write transaction, so processes starting together against the same
+                # database can't both see a missing column or FTS table and both add it
+                cursor.execute("BEGIN IMMEDIATE")
+
+                # Documents table - stores metadata about each processed document
+                cursor.execute(CREATE_DOC_TABLE)
+
+                # Databases created before content hashing lack the column
+                cursor.execute("PRAGMA table_info(documents)")
+                if "content_hash" not in {row["name"] for row in cursor.fetchall()}:
+                    cursor.execute("ALTER TABLE documents ADD COLUMN content_hash TEXT")
+
+                # Elements table - stores individual document elements
+                cursor.execute(CREATE_ELEM_TABLE)
+
+                # Statistics table - stores document-level statistics
+                cursor.execute(CREATE_STATISTICS_TABLE)
+
+                # Full-text index over element content, backfilled when first added to a database
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'elements_fts'")
+                fts_exists = cursor.fetchone() is not None
+                cursor.execute(CREATE_ELEM_FTS_TABLE)
+                for trigger in CREATE_ELEM_FTS_TRIGGERS:
+                    cursor.execute(trigger)
+                if not fts_exists:
+                    cursor.execute("INSERT INTO elements_fts (elements_fts) VALUES ('rebuild')")
+
+                # Create indexes for better query performance
+                # One composite index serves the filters, the ORDER BY and the keyset cursor of the
+                # element queries, so the older per-document indexes are dropped from existing databases
+                for index_name in ("idx_elements_document_id", "idx_elements_page", "idx_elements_lookup"):
+                    cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+                cursor.execute(CREATE_ELEM_PAGE_ORDER_INDEX)
+                # Covering index for the corpus-wide element type summary
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_elements_type ON elements(element_type)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_documents_uuid ON documents(document_uuid)")
+                cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash)")
+
+                cursor.execute("COMMIT")
+            except Exception as e:
+                if self._write_conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                logger.error(f"Error creating database tables: {e}")
+                raise
 
-            conn.commit()
             logger.info("Database tables created/verified successfully")
 
-    def save_document(self, pdf_path: str, elements: List[DocumentElement],
-                      stats: DocumentStatistics, original_filename: str) -> str:
+    def save_document(self, elements: List[DocumentElement],
+                      stats: DocumentStatistics, original_filename: str,
+                      content_hash: Optional[str] = None) -> str:
         """
         Save extracted document data to SQLite database.
-        Returns the document UUID for reference.
+        Returns the document UUID for reference. If a document with the same
+        content hash is already stored, nothing is written and its UUID is returned.
         """
         document_uuid = str(uuid.uuid4())
-        pdf_path = Path(pdf_path)
 
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        with self._write_lock:
+            cursor = self._write_conn.cursor()
 
             try:
+                # Take the write lock up front so all inserts land in a single commit
+                cursor.execute("BEGIN IMMEDIATE")
+
+                # The same content may have been saved since the caller checked
+                if content_hash is not None:
+                    cursor.execute(SELECT_DOC_BY_HASH, (content_hash,))
+                    existing = cursor.fetchone()
+                    if existing:
+                        cursor.execute("ROLLBACK")
+                        logger.info(f"Content already stored as UUID: {existing['document_uuid']}")
+                        return existing["document_uuid"]
+
                 # Insert document metadata
-                cursor.execute("""
-                               INSERT INTO documents (document_uuid, filename)
-                               VALUES (?, ?)
-                               """, (
-                                   document_uuid,
-                                   original_filename,
-                               ))
+                cursor.execute(INSERT_DOC, (document_uuid, original_filename, content_hash))
 
                 document_id = cursor.lastrowid
                 logger.info(f"Document saved with ID: {document_id}, UUID: {document_uuid}")
 
                 # Insert elements
-                element_data = []
-                for elem in elements:
-                    element_data.append((
-                        document_id,
-                        elem.element_type.value,
-                        elem.content,
-                        elem.page_number,
-                        elem.position.get('x0'),
-                        elem.position.get('y0'),
-                        elem.position.get('x1'),
-                        elem.position.get('y1'),
-                    ))
-
-                cursor.executemany("""
-                                   INSERT INTO elements (document_id, element_type, content, page_number,
-                                                         position_x0, position_y0, position_x1, position_y1)
-                                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                                   """, element_data)
+                element_data = (
+                    (document_id, elem.element_type.value, elem.content, elem.page_number, *elem.position)
+                    for elem in elements
+                )
+                self._insert_elements(cursor, element_data)
 
                 # Insert statistics
-                cursor.execute("""
-                               INSERT INTO document_statistics (document_id, title_count,
-                                                                section_count, table_count,
-                                                                image_count,
-                                                                avg_text_density_per_page,
-                                                                avg_hierarchical_depth, avg_paragraph_length,
-                                                                section_distribution)
-                               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                               """, (
-                                   document_id,
-                                   stats.title_count,
-                                   stats.section_count,
-                                   stats.table_count,
-                                   stats.image_count,
-                                   stats.avg_text_density_per_page,
-                                   stats.avg_hierarchical_depth,
-                                   stats.avg_paragraph_length,
-                                   json.dumps(stats.section_distribution)
-                               ))
-
-                conn.commit()
+                cursor.execute(INSERT_STATISTICS, (
+                    document_id,
+                    stats.title_count,
+                    stats.section_count,
+                    stats.table_count,
+                    stats.image_count,
+                    stats.avg_text_density_per_page,
+                    stats.avg_hierarchical_depth,
+                    stats.avg_paragraph_length,
+                    json.dumps(stats.section_distribution, separators=(',', ':'))
+                ))
+
+                cursor.execute("COMMIT")
                 logger.info(f"Successfully saved {len(elements)} elements to database")
-                return document_uuid
 
             except Exception as e:
-                conn.rollback()
+                if self._write_conn.in_transaction:
+                    cursor.execute("ROLLBACK")
                 logger.error(f"Error saving document to database: {e}")
                 raise
 
+            # Keep sqlite_stat1 current as the data distribution grows
+            if document_id % ANALYZE_EVERY_N_DOCUMENTS == 0:
+                cursor.execute("ANALYZE elements")
+                cursor.execute("ANALYZE documents")
+
+            return document_uuid
+
+    def _insert_elements(self, cursor: sqlite3.Cursor, element_data: Iterable[Tuple]):
+        """
+        Insert element rows in full batches through one multi-VALUES statement,
+        then the remainder through the single-row statement.
+        """
+        rows = iter(element_data)
+        while True:
+            batch = list(islice(rows, self._elem_batch_size))
+            if len(batch) < self._elem_batch_size:
+                cursor.executemany(INSERT_ELEM, batch)
+                return
+            cursor.execute(self._insert_elem_batch, list(chain.from_iterable(batch)))
+
     def get_document_by_uuid(self, document_uuid: str) -> Optional[Dict[str, Any]]:
         """Retrieve document metadata by UUID."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row  # Enable column access by name
-            cursor = conn.cursor()
+        cursor = self._reader().cursor()
+
+        cursor.execute(SELECT_DOC_BY_UUID, (document_uuid,))
+
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def get_document_by_hash(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Retrieve document metadata by the SHA-256 hash of its file content."""
+        cursor = self._reader().cursor()
+
+        cursor.execute(SELECT_DOC_BY_HASH, (content_hash,))
+
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def _iter_rows(self, query: str, params: Iterable[Any]) -> Iterator[Dict[str, Any]]:
+        """Run a query and yield rows as dicts, fetching STREAM_BATCH_SIZE rows at a time."""
+        cursor = self._reader().cursor()
+        cursor.arraysize = STREAM_BATCH_SIZE
+        cursor.execute(query, params)
+
+        for rows in iter(cursor.fetchmany, []):
+            for row in rows:
+                yield dict(row)
+
+    def iter_document_elements(self, document_uuid: str,
+                               element_type: Optional[str] = None,
+                               page_number: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream elements for a document with optional filtering.
+        """
+        # Build query with optional filters
+        query = SELECT_DOC_ELEMS
+        params = [document_uuid]
+
+        if element_type:
+            query += " AND e.element_type = ?"
+            params.append(element_type)
+
+        if page_number:
+            query += " AND e.page_number = ?"
+            params.append(page_number)
 
-            cursor.execute("""
-                           SELECT *
-                           FROM documents
-                           WHERE document_uuid = ?
-                           """, (document_uuid,))
+        query += " ORDER BY e.page_number, e.id"
 
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        return self._iter_rows(query, params)
 
     def get_document_elements(self, document_uuid: str,
                               element_type: Optional[str] = None,
@@ -180,113 +503,229 @@ class DocumentStorage:
         """
         Retrieve elements for a document with optional filtering.
         """
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        return list(self.iter_document_elements(document_uuid, element_type, page_number))
+
+    def _select_elements_with_doc(self, document_uuid: str,
+                                  element_type: Optional[str],
+                                  page_number: Optional[int],
+                                  limit: Optional[int] = None,
+                                  after_id: Optional[int] = None,
+                                  with_total: bool = False
+                                  ) -> Tuple[Optional[Dict[str, Any]], Optional[int], List[Dict[str, Any]]]:
+        """
+        Look up a document and one page of its elements with a single query.
+        Returns (doc_info, total, elements); total is None unless `with_total` is set.
+        """
+        filters = ""
+        filter_params = []
+
+        # Filters belong in the join so a document without matches still returns its row
+        if element_type:
+            filters += " AND e.element_type = ?"
+            filter_params.append(element_type)
+
+        if page_number:
+            filters += " AND e.page_number = ?"
+            filter_params.append(page_number)
+
+        # Parameters in placeholder order: total subquery, join filters, cursor, document, limit
+        params = [document_uuid, *filter_params] if with_total else []
+        params.extend(filter_params)
+        if after_id is not None:
+            params.append(after_id)
+        params.append(document_uuid)
+        params.append(limit if limit is not None else -1)
+
+        query = SELECT_ELEMS_WITH_DOC.format(
+            total_column=ELEMS_TOTAL_SUBQUERY.format(filters=filters) if with_total else "NULL",
+            filters=filters,
+            cursor=ELEMS_KEYSET_CURSOR if after_id is not None else "",
+        )
+
+        cursor = self._reader().cursor()
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        if not rows:
+            return None, None, []
+
+        first = rows[0]
+        doc_info = {
+            "document_uuid": first["doc_uuid"],
+            "filename": first["doc_filename"],
+            "processed_at": first["doc_processed_at"],
+        }
+        total = first["doc_total"]
+
+        elements = []
+        for row in rows:
+            # The LEFT JOIN yields one all-NULL element row when nothing matched
+            if row["id"] is None:
+                break
+            element = dict(row)
+            del element["doc_uuid"], element["doc_filename"], element["doc_processed_at"], element["doc_total"]
+            elements.append(element)
+
+        return doc_info, total, elements
+
+    def iter_elements_with_doc(self, document_uuid: str,
+                               element_type: Optional[str] = None,
+                               page_number: Optional[int] = None
+                               ) -> Tuple[Optional[Dict[str, Any]], Iterator[Dict[str, Any]]]:
+        """
+        Look up a document and stream its elements, one keyset page per query.
+        Returns (None, empty iterator) if the document does not exist.
+        """
+        doc_info, _, first_page = self._select_elements_with_doc(document_uuid, element_type, page_number,
+                                                                 limit=STREAM_BATCH_SIZE)
+        if doc_info is None:
+            return None, iter(())
+
+        def elements():
+            page = first_page
+            while page:
+                yield from page
+                if len(page) < STREAM_BATCH_SIZE:
+                    return
+                _, _, page = self._select_elements_with_doc(document_uuid, element_type, page_number,
+                                                            limit=STREAM_BATCH_SIZE,
+                                                            after_id=page[-1]["id"])
+
+        return doc_info, elements()
+
+    def get_elements_with_doc(self, document_uuid: str,
+                              element_type: Optional[str] = None,
+                              page_number: Optional[int] = None,
+                              limit: Optional[int] = None,
+                              after_id: Optional[int] = None
+                              ) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """
+        Retrieve a document, up to `limit` of its elements after the element `after_id`,
+        and the total number of matching elements, with a single query.
+        Returns (None, [], 0) if the document does not exist.
+        """
+        doc_info, total, elements = self._select_elements_with_doc(document_uuid, element_type, page_number,
+                                                                   limit=limit, after_id=after_id,
+                                                                   with_total=True)
+        return doc_info, elements, total or 0
 
-            # Build query with optional filters
-            query = """
-                    SELECT e.*
-                    FROM elements e
-                             JOIN documents d ON e.document_id = d.id
-                    WHERE d.document_uuid = ?
-                    """
-            params = [document_uuid]
+    def count_document_elements(self, document_uuid: str,
+                                element_type: Optional[str] = None,
+                                page_number: Optional[int] = None) -> int:
+        """Count elements for a document with optional filtering, without fetching them."""
+        cursor = self._reader().cursor()
 
-            if element_type:
-                query += " AND e.element_type = ?"
-                params.append(element_type)
+        query = COUNT_DOC_ELEMS
+        params = [document_uuid]
 
-            if page_number:
-                query += " AND e.page_number = ?"
-                params.append(page_number)
+        if element_type:
+            query += " AND e.element_type = ?"
+            params.append(element_type)
 
-            query += " ORDER BY e.page_number, e.position_y0 DESC"
+        if page_number:
+            query += " AND e.page_number = ?"
+            params.append(page_number)
 
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+        cursor.execute(query, params)
+        return cursor.fetchone()["element_count"]
 
-            return [dict(row) for row in rows]
+    def get_statistics_with_doc(self, document_uuid: str
+                                ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Retrieve document metadata and statistics with a single query.
+        Returns (None, {}) if the document does not exist.
+        """
+        cursor = self._reader().cursor()
+
+        cursor.execute(SELECT_STATISTICS_WITH_DOC, (document_uuid,))
+
+        row = cursor.fetchone()
+        if not row:
+            return None, {}
+
+        row = dict(row)
+        stats = {column: row.pop(column) for column in STATISTICS_COLUMNS}
+        if stats["title_count"] is None:
+            return row, {}
+
+        # Only parse section_distribution as JSON
+        if stats.get('section_distribution'):
+            stats['section_distribution'] = json.loads(stats['section_distribution'])
+
+        return row, stats
 
     def get_document_statistics(self, document_uuid: str) -> Dict[str, Any]:
         """Retrieve document statistics."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
-
-            cursor.execute("""
-                           SELECT title_count, section_count, table_count, image_count,
-                                  avg_text_density_per_page,
-                                  avg_hierarchical_depth, avg_paragraph_length, section_distribution
-                            FROM document_statistics ds
-                                    JOIN documents d ON ds.document_id = d.id
-                           WHERE d.document_uuid = ?
-                           """, (document_uuid,))
-
-            row = cursor.fetchone()
-            if not row:
-                return {}
-
-            stats = dict(row)
-            # Only parse section_distribution as JSON
-            if stats.get('section_distribution'):
-                stats['section_distribution'] = json.loads(stats['section_distribution'])
-
-            return stats
+        cursor = self._reader().cursor()
 
-    def list_documents(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """List all processed documents."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+        cursor.execute(SELECT_DOC_STATISTICS, (document_uuid,))
+
+        row = cursor.fetchone()
+        if not row:
+            return {}
 
-            cursor.execute("""
-                           SELECT document_uuid,
-                                  filename,
-                                  processed_at
-                           FROM documents
-                           ORDER BY processed_at DESC LIMIT ?
-                           """, (limit,))
+        stats = dict(row)
+        # Only parse section_distribution as JSON
+        if stats.get('section_distribution'):
+            stats['section_distribution'] = json.loads(stats['section_distribution'])
 
-            rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+        return stats
+
+    def get_global_statistics(self) -> Dict[str, Any]:
+        """Average the per-document statistics across all documents in one query."""
+        cursor = self._reader().cursor()
+
+        cursor.execute(SELECT_GLOBAL_STATISTICS)
+
+        return dict(cursor.fetchone())
+
+    def get_corpus_version(self) -> int:
+        """
+        Return a number that changes whenever a document is saved.
+        Document ids only grow, so the highest one identifies the stored corpus.
+        """
+        cursor = self._reader().cursor()
+
+        cursor.execute(SELECT_CORPUS_VERSION)
+        return cursor.fetchone()["version"]
+
+    def iter_documents(self, limit: int = 100) -> Iterator[Dict[str, Any]]:
+        """Stream processed documents, most recent first."""
+        return self._iter_rows(LIST_DOCS, (limit,))
+
+    def list_documents(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """List all processed documents."""
+        return list(self.iter_documents(limit))
 
     def get_element_type_summary(self) -> Dict[str, int]:
         """Get summary of element types across all documents."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        cursor = self._reader().cursor()
 
-            cursor.execute("""
-                           SELECT element_type, COUNT(*) as count
-                           FROM elements
-                           GROUP BY element_type
-                           ORDER BY count DESC
-                           """)
+        cursor.execute(SELECT_ELEM_TYPE_SUMMARY)
 
-            rows = cursor.fetchall()
-            return {row[0]: row[1] for row in rows}
+        rows = cursor.fetchall()
+        return {row[0]: row[1] for row in rows}
 
-    def search_content(self, search_term: str, document_uuid: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Search for content across documents."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            cursor = conn.cursor()
+    def iter_search_content(self, search_term: str,
+                            document_uuid: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream content matches across documents.
+        Matches elements containing every word of the search term, each as a word prefix.
+        """
+        fts_query = _to_fts_query(search_term)
+        if not fts_query:
+            return iter(())
 
-            query = """
-                    SELECT e.*, d.filename, d.document_uuid
-                    FROM elements e
-                             JOIN documents d ON e.document_id = d.id
-                    WHERE e.content LIKE ? \
-                    """
-            params = [f"%{search_term}%"]
+        query = SEARCH_ELEMS
+        params = [fts_query]
 
-            if document_uuid:
-                query += " AND d.document_uuid = ?"
-                params.append(document_uuid)
+        if document_uuid:
+            query += " AND d.document_uuid = ?"
+            params.append(document_uuid)
 
-            query += " ORDER BY d.filename, e.page_number"
+        query += " ORDER BY d.filename, e.page_number"
 
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+        return self._iter_rows(query, params)
 
-            return [dict(row) for row in rows]
+    def search_content(self, search_term: str, document_uuid: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Search for content across documents."""
+        return list(self.iter_search_content(search_term, document_uuid))
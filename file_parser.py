@@ -1,17 +1,36 @@
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Optional, Any, Tuple, Union
 from enum import Enum
 import fitz  # PyMuPDF
 import re
+import os
+import mmap
+import multiprocessing
 from pathlib import Path
 import json
+import orjson
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Newlines become spaces and tabs are dropped in extracted text content
+CONTENT_WHITESPACE_TABLE = str.maketrans({"\n": " ", "\t": None})
+
+# Below this page count, starting worker processes costs more than it saves
+MIN_PAGES_FOR_PARALLEL = 3
+
+# Page workers are started from a clean process rather than forked from the caller,
+# which may be running threads (e.g. a web server's threadpool)
+PAGE_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
 
 class ElementType(Enum):
     """Enumeration for different types of document elements."""
@@ -24,7 +43,7 @@ class ElementType(Enum):
     IMAGE = "image"
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentElement:
     """
     Represents a single element extracted from the PDF.
@@ -33,7 +52,7 @@ class DocumentElement:
     element_type: ElementType
     content: str
     page_number: int
-    position: Dict[str, float]  # x0, y0, x1, y1 coordinates
+    position: Tuple[float, float, float, float]  # x0, y0, x1, y1 coordinates
     font_info: Dict[str, Any]  # font name, size, flags
 
     def to_dict(self) -> Dict[str, Any]:
@@ -42,12 +61,12 @@ class DocumentElement:
             'element_type': self.element_type.value,
             'content': self.content,
             'page_number': self.page_number,
-            'position': self.position,
+            'position': dict(zip(('x0', 'y0', 'x1', 'y1'), self.position)),
             'font_info': self.font_info,
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class DocumentStatistics:
     """Statistics about the extracted document structure."""
     title_count: int
@@ -72,35 +91,99 @@ class DocumentStatistics:
         }
 
 
+# List item patterns, compiled once into a single alternation
+LIST_ITEM_PATTERN = re.compile(r"""
+    ^\s*(?:
+        [•·▪▫‣⁃]        # Bullet points
+      | \d+[.)]        # Numbered lists
+      | [a-zA-Z][.)]   # Lettered lists
+      | [-*+]          # Dash/asterisk lists
+    )\s+
+""", re.VERBOSE)
+
+# Longest block, in words, that can still be classified as a section
+MAX_COUNTED_WORDS = 20
+
+
 def classify_items(text: str, font_info: Dict[str, Any]) -> ElementType:
     """Font based classification."""
     text_stripped = text.strip()
-    word_count = len(text_stripped.split())
-    is_bold = bool(font_info['flags'] & 16)
+    is_bold = font_info['flags'] & 16
+    size = font_info['size']
 
     # List item pattern checking
-    list_patterns = [
-        r'^\s*[•·▪▫‣⁃]\s+',  # Bullet points
-        r'^\s*\d+[\.\)]\s+',  # Numbered lists
-        r'^\s*[a-zA-Z][\.\)]\s+',  # Lettered lists
-        r'^\s*[-\*\+]\s+',  # Dash/asterisk lists
-    ]
-    if any(re.match(pattern, text_stripped) for pattern in list_patterns):
+    if LIST_ITEM_PATTERN.match(text_stripped):
         return ElementType.LIST_ITEM
 
     # Font-size based classification
-    if font_info['size'] >= 16 and is_bold:
+    if size >= 16 and is_bold:
         return ElementType.TITLE
-    elif font_info['size'] >= 14 and (is_bold or word_count <= 10):
+    if size < 10:
+        return ElementType.PARAGRAPH
+
+    # Thresholds only distinguish counts up to 20, so stop splitting after that
+    word_count = len(text_stripped.split(maxsplit=MAX_COUNTED_WORDS))
+    if size >= 14 and (is_bold or word_count <= 10):
         return ElementType.SUBTITLE
-    elif font_info['size'] >= 10 and (word_count <= 20):
+    elif word_count <= MAX_COUNTED_WORDS:
         return ElementType.SECTION
     else:
         return ElementType.PARAGRAPH
 
+@contextmanager
+def open_mapped_pdf(pdf_path: str):
+    """
+    Open a PDF over a read-only memory map of the file.
+    MuPDF reads straight from the mapping, so pages are faulted in on demand
+    instead of being copied onto the heap.
+    """
+    with open(pdf_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # An empty file cannot be mapped; let PyMuPDF report it as it would for a path
+            doc = fitz.open(pdf_path)
+            try:
+                yield doc
+            finally:
+                doc.close()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                doc = fitz.open(stream=view, filetype='pdf')
+                try:
+                    yield doc
+                finally:
+                    doc.close()
+            finally:
+                # The map can only be closed once no views are left, even if opening failed
+                view.release()
+
+
+# A PDF source: a file path, or the file content itself
+PDFSource = Union[str, bytes, bytearray]
+
+
+@contextmanager
+def open_pdf_source(source: PDFSource):
+    """Open a PDF from a path (memory-mapped) or from bytes already in memory."""
+    if isinstance(source, (bytes, bytearray)):
+        doc = fitz.open(stream=source, filetype='pdf')
+        try:
+            yield doc
+        finally:
+            doc.close()
+    else:
+        with open_mapped_pdf(source) as doc:
+            yield doc
+
+
 class PDFExtractor:
     """Main class for extracting structure from PDF documents."""
 
+    def __init__(self, max_workers: Optional[int] = None):
+        """`max_workers` caps the processes used for page extraction (defaults to the CPU count)."""
+        self.max_workers = max_workers or os.cpu_count() or 1
+
     def extract_structure(self, pdf_path: str) -> Tuple[List[DocumentElement], DocumentStatistics]:
         """
         Extract structure from a PDF file.
@@ -112,17 +195,34 @@ class PDFExtractor:
 
         logger.info(f"Processing PDF: {pdf_path.name}")
 
+        return self._extract_source(str(pdf_path))
+
+    def extract_structure_from_bytes(self, content: Union[bytes, bytearray]) -> Tuple[List[DocumentElement], DocumentStatistics]:
+        """
+        Extract structure from PDF content held in memory, e.g. an upload.
+        Returns list of elements and document statistics.
+        """
+        logger.info(f"Processing PDF from memory ({len(content)} bytes)")
+
+        return self._extract_source(content)
+
+    def _extract_source(self, source: PDFSource) -> Tuple[List[DocumentElement], DocumentStatistics]:
+        """Extract elements and statistics from an opened PDF source."""
         # Open PDF document
-        doc = fitz.open(str(pdf_path))
         elements = []
 
-        try:
+        with open_pdf_source(source) as doc:
             # Extract elements from each page
             logger.info("Extracting document elements...")
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                page_elements = self._extract_page_elements(page, page_num + 1)
-                elements.extend(page_elements)
+            page_count = len(doc)
+            workers = min(self.max_workers, page_count)
+            if workers > 1 and page_count >= MIN_PAGES_FOR_PARALLEL:
+                elements = self._extract_pages_parallel(source, page_count, workers)
+            else:
+                for page_num in range(page_count):
+                    page = doc[page_num]
+                    page_elements = self._extract_page_elements(page, page_num + 1)
+                    elements.extend(page_elements)
 
             # Generate statistics
             logger.info("Generating document statistics...")
@@ -131,8 +231,20 @@ class PDFExtractor:
             logger.info(f"Extraction complete: {len(elements)} elements found")
             return elements, stats
 
-        finally:
-            doc.close()
+    def _extract_pages_parallel(self, source: PDFSource, page_count: int, workers: int) -> List[DocumentElement]:
+        """
+        Extract pages across worker processes. Pages are split into contiguous ranges,
+        a few per worker to even out uneven page costs, and results are joined in page order.
+        The source is handed to each worker once, not once per range.
+        """
+        chunk_size = -(-page_count // (workers * 4))
+        starts = range(0, page_count, chunk_size)
+        stops = [min(start + chunk_size, page_count) for start in starts]
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=PAGE_POOL_CONTEXT,
+                                 initializer=_init_page_worker, initargs=(source,)) as executor:
+            results = executor.map(_extract_page_range, starts, stops)
+            return list(chain.from_iterable(results))
 
     def _extract_page_elements(self, page, page_number: int) -> List[DocumentElement]:
         """Extract elements from a single page."""
@@ -143,36 +255,34 @@ class PDFExtractor:
 
         for block in blocks.get("blocks", []):
             if "lines" in block:  # Text block
-                text_content = ""
-                font_info = {}
-                position = {
-                    'x0': round(block['bbox'][0], 4),
-                    'y0': round(block['bbox'][1], 4),
-                    'x1': round(block['bbox'][2], 4),
-                    'y1': round(block['bbox'][3], 4)
-                }
+                text_parts = []
+                font_info = None
+                x0, y0, x1, y1 = block['bbox']
+                position = (round(x0, 4), round(y0, 4), round(x1, 4), round(y1, 4))
 
                 # Collect text and font info from spans
                 for line in block["lines"]:
                     for span in line["spans"]:
-                        text_content += span["text"]
-                        if not font_info:  # Use first span's font info
+                        text_parts.append(span["text"])
+                        if font_info is None:  # Use first span's font info
                             font_info = {
                                 'name': span["font"],
                                 'size': span["size"],
                                 'flags': span["flags"]
                             }
+                text_content = "".join(text_parts)
+                text_stripped = text_content.strip()
 
                 # Skip empty or whitespace-only blocks
-                if not text_content.strip():
+                if not text_stripped:
                     continue
 
                 # Classify the element
-                element_type = classify_items(text_content, font_info)
+                element_type = classify_items(text_stripped, font_info)
 
                 element = DocumentElement(
                     element_type=element_type,
-                    content=text_content.strip().replace("\n", " ").replace("\t", ""),
+                    content=text_stripped.translate(CONTENT_WHITESPACE_TABLE),
                     page_number=page_number,
                     position=position,
                     font_info=font_info,
@@ -191,12 +301,7 @@ class PDFExtractor:
                 element_type=ElementType.IMAGE,
                 content=f"Image_{page_number}_{img_index}",
                 page_number=page_number,
-                position={
-                    'x0': img_rect.x0,
-                    'y0': img_rect.y0,
-                    'x1': img_rect.x1,
-                    'y1': img_rect.y1
-                },
+                position=(img_rect.x0, img_rect.y0, img_rect.x1, img_rect.y1),
                 font_info={},
             )
             elements.append(element)
@@ -218,12 +323,7 @@ class PDFExtractor:
                 element_type=ElementType.TABLE,
                 content=table_text,
                 page_number=page_number,
-                position={
-                    'x0': table.bbox[0],
-                    'y0': table.bbox[1],
-                    'x1': table.bbox[2],
-                    'y1': table.bbox[3]
-                },
+                position=tuple(table.bbox),
                 font_info={},
             )
             elements.append(element)
@@ -236,40 +336,42 @@ class PDFExtractor:
         # Page counts
         total_pages = len(doc)
 
+        # Every tally is gathered in a single pass over the elements
+        element_counts = Counter()
+        hierarchical_counts_per_page = defaultdict(int)
+        section_distribution = defaultdict(int)
+        total_text_length = 0
+        paragraph_count = 0
+        paragraph_word_count = 0
+        hierarchical_types = (ElementType.TITLE, ElementType.SUBTITLE, ElementType.SECTION)
+        for elem in elements:
+            element_type = elem.element_type
+            element_counts[element_type] += 1
+            total_text_length += len(elem.content)
+            if element_type in hierarchical_types:
+                hierarchical_counts_per_page[elem.page_number] += 1
+                if element_type is ElementType.SECTION:
+                    section_distribution[elem.page_number] += 1
+            elif element_type is ElementType.PARAGRAPH:
+                paragraph_count += 1
+                paragraph_word_count += len(elem.content.split())
+
         # Element type counts
-        element_counts = Counter(elem.element_type.value for elem in elements)
-        title_count = element_counts.get(ElementType.TITLE.value, 0)
-        section_count = element_counts.get(ElementType.SECTION.value, 0)
-        table_count = element_counts.get(ElementType.TABLE.value, 0)
-        image_count = element_counts.get(ElementType.IMAGE.value, 0)
+        title_count = element_counts[ElementType.TITLE]
+        section_count = element_counts[ElementType.SECTION]
+        table_count = element_counts[ElementType.TABLE]
+        image_count = element_counts[ElementType.IMAGE]
 
         # Text density per page
-        text_density_per_page = []
-        for page_num in range(1, total_pages + 1):
-            page_elements = [e for e in elements if e.page_number == page_num]
-            page_text_length = sum(len(e.content) for e in page_elements)
-            text_density_per_page.append(page_text_length)
-        avg_text_density_per_page = round(sum(text_density_per_page)/len(text_density_per_page), 2)
+        avg_text_density_per_page = round(total_text_length / max(total_pages, 1), 2)
 
         # Average hierarchical depth
-        hierarchical_elements = [e for e in elements if
-                                 e.element_type in [ElementType.TITLE, ElementType.SUBTITLE, ElementType.SECTION]]
-        hierarchical_counts_per_page = defaultdict(int)
         avg_hierarchical_depth = 0
-        for elem in hierarchical_elements:
-            hierarchical_counts_per_page[elem.page_number] += 1
         if len(hierarchical_counts_per_page) != 0:
             avg_hierarchical_depth = round(sum(hierarchical_counts_per_page.values()) / len(hierarchical_counts_per_page), 2)
 
         # Average paragraph length
-        paragraphs = [e for e in elements if e.element_type == ElementType.PARAGRAPH]
-        avg_paragraph_length = round(sum(len(p.content.split()) for p in paragraphs) / len(paragraphs), 2) if paragraphs else 0
-
-        # Section distribution by page
-        section_distribution = defaultdict(int)
-        for elem in elements:
-            if elem.element_type == ElementType.SECTION:
-                section_distribution[elem.page_number] += 1
+        avg_paragraph_length = round(paragraph_word_count / paragraph_count, 2) if paragraph_count else 0
 
         return DocumentStatistics(
             title_count=title_count,
@@ -284,15 +386,20 @@ class PDFExtractor:
 
 
     def save_to_json(self, elements: List[DocumentElement],
-                     stats: DocumentStatistics, output_path: str):
-        """Save extracted data to JSON file."""
+                     stats: DocumentStatistics, output_path: str, pretty: bool = False):
+        """Save extracted data to JSON file (UTF-8, indented only when `pretty` is set)."""
         data = {
             'elements': [elem.to_dict() for elem in elements],
             'statistics': stats.to_dict()
         }
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # section_distribution is keyed by page number, hence OPT_NON_STR_KEYS
+        options = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(data, option=options))
 
         logger.info(f"Data saved to: {output_path}")
 
@@ -304,3 +411,24 @@ class PDFExtractor:
         return data['elements'], data['statistics']
 
 
+# PDF source of the document being extracted, set once per worker process
+_worker_source: Optional[PDFSource] = None
+
+
+def _init_page_worker(source: PDFSource) -> None:
+    """Worker initializer for parallel extraction: remember the PDF source."""
+    global _worker_source
+    _worker_source = source
+
+
+def _extract_page_range(start: int, stop: int) -> List[DocumentElement]:
+    """
+    Worker entry point for parallel extraction: extract pages [start, stop).
+    fitz documents can't be pickled, so each worker opens its own copy.
+    """
+    extractor = PDFExtractor()
+    elements = []
+    with open_pdf_source(_worker_source) as doc:
+        for page_num in range(start, stop):
+            elements.extend(extractor._extract_page_elements(doc[page_num], page_num + 1))
+    return elements
@@ -1,29 +1,79 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
-from fastapi.responses import JSONResponse, Response
-from typing import Optional, List
-import tempfile
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from typing import Optional, List, Tuple, Dict, Any
+import hashlib
 import os
-import json
+import orjson
 import csv
-import io
+from functools import partial
+from itertools import chain
 import logging
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 
-from file_parser import PDFExtractor
+from file_parser import PDFExtractor, PAGE_POOL_CONTEXT
 from doc_storage import DocumentStorage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Responses smaller than this (in bytes) are sent uncompressed
+GZIP_MINIMUM_SIZE = 1024
+
 app = FastAPI(
     title="PDF Document Analysis API",
     description="API for extracting and analyzing PDF document structure",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+# Compress large JSON and CSV responses for clients that accept gzip. Behind a reverse
+# proxy that already compresses, drop this so responses are not compressed twice
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+# Size of the chunks read from an upload while buffering and hashing it
+UPLOAD_CHUNK_SIZE = 1 << 16
+
+# Uploads extracted at the same time by each server worker. Extraction runs in a
+# separate process, so parsing never holds the GIL of the process serving requests
+MAX_CONCURRENT_EXTRACTIONS = 1
+
+# Uvicorn worker processes; set PDF_API_WORKERS when launching uvicorn some other way
+# so every worker sizes its extractor for the same count
+SERVER_WORKERS = int(os.environ.get("PDF_API_WORKERS", min(os.cpu_count() or 1, 8)))
+
+# The cores are shared between the server workers: each extraction process fans large
+# documents out over this many page processes (none when it is 1), so at most
+# SERVER_WORKERS * EXTRACTION_PROCESSES processes parse PDFs at once
+EXTRACTION_PROCESSES = max(1, (os.cpu_count() or 1) // SERVER_WORKERS)
+
 # Initialize components
-pdf_extractor = PDFExtractor()
+pdf_extractor = PDFExtractor(max_workers=EXTRACTION_PROCESSES)
 doc_storage = DocumentStorage()
+# Long-lived extraction processes, started from a clean process like the page workers
+extraction_pool = ProcessPoolExecutor(max_workers=MAX_CONCURRENT_EXTRACTIONS,
+                                      mp_context=PAGE_POOL_CONTEXT)
+
+
+def _stored_upload_result(content_hash: str) -> Optional[Dict[str, Any]]:
+    """Build the upload response for already stored content, or None if it is new."""
+    existing = doc_storage.get_document_by_hash(content_hash)
+    if not existing:
+        return None
+
+    return {
+        "message": "Document already processed",
+        "document_uuid": existing["document_uuid"],
+        "filename": existing["filename"],
+        "elements_count": doc_storage.count_document_elements(existing["document_uuid"]),
+        "statistics": doc_storage.get_document_statistics(existing["document_uuid"])
+    }
+
+
+# (corpus version, global statistics) of the last /statistics/global computation
+_global_stats_cache: Optional[Tuple[int, Dict[str, Any]]] = None
 
 
 @app.post("/documents/upload")
@@ -35,23 +85,34 @@ async def upload_document(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
 
     try:
-        # Create temporary file to save uploaded PDF
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        # Read the upload into memory, hashing it on the way
+        hasher = hashlib.sha256()
+        content = bytearray()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            hasher.update(chunk)
+            content += chunk
+        content_hash = hasher.hexdigest()
+
+        # Identical content was already processed: return the stored results
+        existing = await asyncio.get_running_loop().run_in_executor(
+            None, _stored_upload_result, content_hash
+        )
+        if existing:
+            logger.info(f"Uploaded file {file.filename} matches document {existing['document_uuid']}")
+            return ORJSONResponse(status_code=200, content=existing)
 
-        # Process the PDF
+        # Extract the PDF in the extraction process, then save it off the event loop
         logger.info(f"Processing uploaded file: {file.filename}")
-        elements, statistics = pdf_extractor.extract_structure(temp_file_path)
-
-        # Save to database
-        document_uuid = doc_storage.save_document(temp_file_path, elements, statistics, file.filename)
-
-        # Clean up temporary file
-        os.unlink(temp_file_path)
+        loop = asyncio.get_running_loop()
+        elements, statistics = await loop.run_in_executor(
+            extraction_pool, pdf_extractor.extract_structure_from_bytes, content
+        )
+        document_uuid = await loop.run_in_executor(
+            None, partial(doc_storage.save_document, elements, statistics, file.filename,
+                          content_hash=content_hash)
+        )
 
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=201,
             content={
                 "message": "Document processed successfully",
@@ -63,23 +124,19 @@ async def upload_document(file: UploadFile = File(...)):
         )
 
     except Exception as e:
-        # Clean up temp file if it exists
-        if 'temp_file_path' in locals():
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
-
         logger.error(f"Error processing document: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
 
+# Handlers that only query the database are plain functions: FastAPI runs them in
+# its threadpool, where each thread reuses its own read connection, so blocking
+# SQLite calls never stall the event loop
 @app.get("/documents")
-async def list_documents(limit: int = Query(100, ge=1, le=1000)):
+def list_documents(limit: int = Query(100, ge=1, le=1000)):
     """Return list of analyzed documents."""
     try:
         documents = doc_storage.list_documents(limit=limit)
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "documents": documents,
                 "count": len(documents)
@@ -91,31 +148,34 @@ async def list_documents(limit: int = Query(100, ge=1, le=1000)):
 
 
 @app.get("/documents/{document_uuid}/elements")
-async def get_document_elements(
+def get_document_elements(
         document_uuid: str,
         element_type: Optional[str] = Query(None, description="Filter by element type"),
-        page_number: Optional[int] = Query(None, ge=1, description="Filter by page number")
+        page_number: Optional[int] = Query(None, ge=1, description="Filter by page number"),
+        limit: int = Query(500, ge=1, le=5000, description="Maximum number of elements to return"),
+        after_id: Optional[int] = Query(None, description="Return elements after this element id (next_cursor)")
 ):
-    """Return extracted elements for a specific document."""
+    """Return extracted elements for a specific document, one page at a time."""
     try:
-        # Verify document exists
-        doc_info = doc_storage.get_document_by_uuid(document_uuid)
-        if not doc_info:
-            raise HTTPException(status_code=404, detail="Document not found")
-
-        # Get elements with optional filtering
-        elements = doc_storage.get_document_elements(
+        # Get the document and a page of its elements with optional filtering
+        doc_info, elements, total = doc_storage.get_elements_with_doc(
             document_uuid=document_uuid,
             element_type=element_type,
-            page_number=page_number
+            page_number=page_number,
+            limit=limit,
+            after_id=after_id
         )
+        if not doc_info:
+            raise HTTPException(status_code=404, detail="Document not found")
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "document_uuid": document_uuid,
                 "filename": doc_info["filename"],
                 "elements": elements,
                 "count": len(elements),
+                "total": total,
+                "next_cursor": elements[-1]["id"] if len(elements) == limit else None,
                 "filters": {
                     "element_type": element_type,
                     "page_number": page_number
@@ -131,18 +191,15 @@ async def get_document_elements(
 
 
 @app.get("/documents/{document_uuid}/statistics")
-async def get_document_stats(document_uuid: str):
+def get_document_stats(document_uuid: str):
     """Return statistics for a specific document."""
     try:
-        # Verify document exists
-        doc_info = doc_storage.get_document_by_uuid(document_uuid)
+        # Get the document and its statistics
+        doc_info, statistics = doc_storage.get_statistics_with_doc(document_uuid)
         if not doc_info:
             raise HTTPException(status_code=404, detail="Document not found")
 
-        # Get statistics
-        statistics = doc_storage.get_document_statistics(document_uuid)
-
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "document_uuid": document_uuid,
                 "filename": doc_info["filename"],
@@ -159,57 +216,50 @@ async def get_document_stats(document_uuid: str):
 
 
 @app.get("/statistics/global")
-async def get_global_stats():
+def get_global_stats():
     """Return statistics across all documents."""
+    global _global_stats_cache
     try:
-        # Get all documents
-        documents = doc_storage.list_documents(limit=1000)  # Adjust limit as needed
-
-        if not documents:
-            return JSONResponse(
+        # Version 0 means no document has been saved yet
+        corpus_version = doc_storage.get_corpus_version()
+        if corpus_version == 0:
+            return ORJSONResponse(
                 content={
                     "message": "No documents found",
                     "global_statistics": {}
                 }
             )
 
+        # Reuse the last result while no document has been added since
+        if _global_stats_cache is not None and _global_stats_cache[0] == corpus_version:
+            return ORJSONResponse(
+                content={
+                    "global_statistics": _global_stats_cache[1]
+                }
+            )
+
         # Get element type summary
         element_summary = doc_storage.get_element_type_summary()
 
-        # Calculate global statistics
-        total_documents = len(documents)
-
-        # Get statistics for each document to calculate averages
-        all_stats = []
-        for doc in documents:
-            doc_stats = doc_storage.get_document_statistics(doc['document_uuid'])
-            if doc_stats:
-                all_stats.append(doc_stats)
-
-        # Calculate averages
-        avg_title_count = sum(s.get('title_count', 0) for s in all_stats) / len(all_stats) if all_stats else 0
-        avg_section_count = sum(s.get('section_count', 0) for s in all_stats) / len(all_stats) if all_stats else 0
-        avg_table_count = sum(s.get('table_count', 0) for s in all_stats) / len(all_stats) if all_stats else 0
-        avg_image_count = sum(s.get('image_count', 0) for s in all_stats) / len(all_stats) if all_stats else 0
-        avg_paragraph_length = sum(s.get('avg_paragraph_length', 0) for s in all_stats) / len(
-            all_stats) if all_stats else 0
-        avg_text_density = sum(s.get('avg_text_density_per_page', 0) for s in all_stats) / len(
-            all_stats) if all_stats else 0
+        # Document count and averages across all documents, aggregated by the database
+        averages = doc_storage.get_global_statistics()
+        total_documents = averages["document_count"]
 
         global_statistics = {
             "total_documents": total_documents,
             "element_type_summary": element_summary,
             "averages_across_documents": {
-                "avg_titles_per_document": round(avg_title_count, 2),
-                "avg_sections_per_document": round(avg_section_count, 2),
-                "avg_tables_per_document": round(avg_table_count, 2),
-                "avg_images_per_document": round(avg_image_count, 2),
-                "avg_paragraph_length": round(avg_paragraph_length, 2),
-                "avg_text_density_per_page": round(avg_text_density, 2)
+                "avg_titles_per_document": round(averages["avg_title_count"], 2),
+                "avg_sections_per_document": round(averages["avg_section_count"], 2),
+                "avg_tables_per_document": round(averages["avg_table_count"], 2),
+                "avg_images_per_document": round(averages["avg_image_count"], 2),
+                "avg_paragraph_length": round(averages["avg_paragraph_length"], 2),
+                "avg_text_density_per_page": round(averages["avg_text_density_per_page"], 2)
             }
         }
+        _global_stats_cache = (corpus_version, global_statistics)
 
-        return JSONResponse(
+        return ORJSONResponse(
             content={
                 "global_statistics": global_statistics
             }
@@ -220,58 +270,64 @@ async def get_global_stats():
         raise HTTPException(status_code=500, detail=f"Error retrieving global statistics: {str(e)}")
 
 
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer yields rows."""
+
+    def write(self, value):
+        return value
+
+
 @app.get("/documents/{document_uuid}/export/csv")
-async def export_elements_csv(
+def export_elements_csv(
         document_uuid: str,
         element_type: Optional[str] = Query(None, description="Element type to export")
 ):
     """Export document elements as CSV."""
-    doc_info = doc_storage.get_document_by_uuid(document_uuid)
+    doc_info, elements = doc_storage.iter_elements_with_doc(document_uuid, element_type=element_type)
     if not doc_info:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    elements = doc_storage.get_document_elements(document_uuid, element_type=element_type)
-    if not elements:
+    first_element = next(elements, None)
+    if first_element is None:
         element_name = element_type or "elements"
         raise HTTPException(status_code=404, detail=f"No {element_name} found")
 
-    output = io.StringIO()
-    writer = csv.writer(output)
+    writer = csv.writer(_Echo())
 
-    # Dynamic headers based on element type
-    element_name = element_type or "Element"
-    writer.writerow([f"{element_name.title()}_ID", "Page", "Type", "Content"])
+    def rows():
+        # Dynamic headers based on element type
+        element_name = element_type or "Element"
+        yield writer.writerow([f"{element_name.title()}_ID", "Page", "Type", "Content"])
 
-    for i, element in enumerate(elements):
-        writer.writerow([
-            element["id"],
-            element["page_number"],
-            element["element_type"],
-            element["content"]
-        ])
+        for element in chain((first_element,), elements):
+            yield writer.writerow([
+                element["id"],
+                element["page_number"],
+                element["element_type"],
+                element["content"]
+            ])
 
     # Dynamic filename
     type_suffix = f"_{element_type}" if element_type else "_all"
     filename = f"{doc_info['filename']}{type_suffix}.csv"
 
-    return Response(
-        content=output.getvalue(),
+    return StreamingResponse(
+        rows(),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 @app.get("/documents/{document_uuid}/export/json")
-async def export_metadata_json(document_uuid: str):
+def export_metadata_json(document_uuid: str):
     """Export document metadata as JSON."""
-    doc_info = doc_storage.get_document_by_uuid(document_uuid)
+    doc_info, statistics = doc_storage.get_statistics_with_doc(document_uuid)
     if not doc_info:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    statistics = doc_storage.get_document_statistics(document_uuid)
     metadata = {"document_info": doc_info, "statistics": statistics}
 
     return Response(
-        content=json.dumps(metadata, indent=2, default=str, ensure_ascii=False),
+        content=orjson.dumps(metadata, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=str),
         media_type="application/json",
         headers={"Content-Disposition": f"attachment; filename={doc_info['filename']}_metadata.json"}
     )
@@ -279,7 +335,7 @@ async def export_metadata_json(document_uuid: str):
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return JSONResponse(
+    return ORJSONResponse(
         content={
             "status": "healthy",
             "message": "PDF Document Analysis API is running"
@@ -299,4 +355,7 @@ async def root():
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Several worker processes need the app as an import string. The "auto" loop and
+    # HTTP implementations pick uvloop and httptools whenever they are installed
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=SERVER_WORKERS,
+                loop="auto", http="auto")
\ No newline at end of file